@@ -0,0 +1,11 @@
+-- Indexes the incremental streams rely on, run with the bootstrap_index setting.
+-- {schema} is replaced with the schema_name setting.
+
+-- general_ledger and pnl_detail seek on (post_date, general_ledger_key)
+CREATE INDEX IF NOT EXISTS ix_gl_post_key
+    ON {schema}.general_ledger (post_date, general_ledger_key)
+    INCLUDE (account_key, organization_key, customer_key, project_key, person_key, debit_amount, credit_amount);
+
+-- persons seeks on (last_modified_timestamp, person_key)
+CREATE INDEX IF NOT EXISTS ix_person_modified_key
+    ON {schema}.person (last_modified_timestamp, person_key);
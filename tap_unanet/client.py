@@ -3,27 +3,206 @@
 import pyodbc
 import logging
 import singer
-from typing import Any, Optional, List, Iterable, cast, Union, Type, Dict
-from singer.schema import Schema
-from singer_sdk import PluginBase, SQLTap, SQLStream, SQLConnector
+from typing import Any, Optional, List, Iterable, Iterator, Dict, Generator
+from singer_sdk import PluginBase
 from singer_sdk.streams import Stream
 from singer_sdk import typing as th
-from singer_sdk.helpers._singer import CatalogEntry, MetadataMapping
 import singer_sdk.helpers._catalog as catalog
 import json
-import requests
+import re
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import itertools
+import hashlib
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+try:
+    import arrow_odbc
+except ImportError:
+    arrow_odbc = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+SQLTYPE_LOOKUP: Dict[str, dict] = {
+    "timestamp": th.DateTimeType.type_dict,
+    "datetime": th.DateTimeType.type_dict,
+    "date": th.DateType.type_dict,
+    "int": th.IntegerType.type_dict,
+    "number": th.NumberType.type_dict,
+    "decimal": th.NumberType.type_dict,
+    "double": th.NumberType.type_dict,
+    "float": th.NumberType.type_dict,
+    "string": th.StringType.type_dict,
+    "text": th.StringType.type_dict,
+    "str": th.StringType.type_dict,
+    "char": th.StringType.type_dict,
+    "bool": th.BooleanType.type_dict,
+    "variant": th.StringType.type_dict,
+    "numeric": th.NumberType.type_dict,
+    "real": th.NumberType.type_dict,
+    "money": th.NumberType.type_dict,
+    # before the Virtuality integer names, so binary types stay strings
+    "binary": th.StringType.type_dict,
+    "bytearray": th.StringType.type_dict,
+    "long": th.IntegerType.type_dict,
+    "short": th.IntegerType.type_dict,
+    "byte": th.IntegerType.type_dict,
+}
+
+# One lookahead per lookup key, tried in order, so the first key contained
+# anywhere in the type name wins just like a linear substring scan would.
+SQLTYPE_PATTERN = re.compile(
+    "|".join(f"(?=.*?(?P<{sqltype}>{sqltype}))" for sqltype in SQLTYPE_LOOKUP)
+)
+
+
+def _dump_json(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def compile_row_builder(columns: tuple):
+    """Compile a function mapping a row to {column: row[i]} in one dict display.
+
+    A later duplicate column name wins, the same as dict(zip(columns, row)).
+    """
+    fields = ", ".join(
+        f"{column!r}: row[{index}]" for index, column in enumerate(columns)
+    )
+    namespace: dict = dict()
+    exec(f"def build_row(row):\n    return {{{fields}}}", namespace)
+    return namespace["build_row"]
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_jsonschema_type(type_name: str) -> dict:
+    match = SQLTYPE_PATTERN.match(type_name)
+    if match is None:
+        return SQLTYPE_LOOKUP["string"]
+    return SQLTYPE_LOOKUP[match.lastgroup]
+
+
+class OdbcConnectionPool:
+    """Bounded pool of pyodbc connections to a single DSN.
+
+    Pools are shared per connection string, so every client of the same
+    database checks connections out of the same pool.
+    """
+
+    # seconds a pooled connection may sit idle before it is pinged on checkout
+    keepalive = 60
+
+    _pools: Dict[str, "OdbcConnectionPool"] = dict()
+    _pools_lock = threading.Lock()
 
+    def __init__(
+        self,
+        conn_str: str,
+        logger: logging.Logger,
+        min_size: int = 1,
+        max_size: int = 4,
+    ) -> None:
+        self.logger = logger
+        self._conn_str = conn_str
+        # idle connections with the time they were returned, most recent last
+        self._idle: "queue.LifoQueue[tuple]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.prepared_cursors: Dict[
+            pyodbc.Connection, "OrderedDict[str, pyodbc.Cursor]"
+        ] = dict()
+
+        # open min_size connections eagerly so bad credentials fail fast
+        for _ in range(max(min_size, 1)):
+            self._idle.put((self._connect(), time.monotonic()))
 
-class Singleton(type):
-    _instances = dict()
+        self.logger.info("ODBC connected")
 
-    def __call__(cls, *args: Any, **kwds: Any) -> Any:
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwds)
-        return cls._instances[cls]
+    @classmethod
+    def for_dsn(
+        cls,
+        conn_str: str,
+        logger: logging.Logger,
+        min_size: int = 1,
+        max_size: int = 4,
+    ) -> "OdbcConnectionPool":
+        """Return the pool for the connection string, creating it once."""
+        with cls._pools_lock:
+            pool = cls._pools.get(conn_str)
+            if pool is None:
+                pool = cls(conn_str, logger, min_size, max_size)
+                cls._pools[conn_str] = pool
+            return pool
+
+    def _connect(self) -> pyodbc.Connection:
+        connection = pyodbc.connect(self._conn_str)
+        self.prepared_cursors[connection] = OrderedDict()
+        return connection
+
+    def _discard(self, connection: pyodbc.Connection) -> None:
+        self.prepared_cursors.pop(connection, None)
+        try:
+            connection.close()
+        except pyodbc.Error:
+            pass
 
+    def _checkout(self) -> pyodbc.Connection:
+        try:
+            connection, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+        if time.monotonic() - last_used > self.keepalive:
+            try:
+                connection.execute("SELECT 1").fetchone()
+            except pyodbc.Error:
+                self.logger.info("Replacing stale ODBC connection")
+                self._discard(connection)
+                return self._connect()
+        return connection
+
+    @contextmanager
+    def get_conn(self) -> Iterator[pyodbc.Connection]:
+        """Check a connection out of the pool for the duration of the block.
+
+        Connections are opened lazily, at most max_size at a time. A
+        connection that raised a pyodbc error is closed instead of returned.
+        """
+        self._slots.acquire()
+        connection = None
+        try:
+            connection = self._checkout()
+            yield connection
+        except pyodbc.Error:
+            if connection is not None:
+                self._discard(connection)
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                self._idle.put((connection, time.monotonic()))
+            self._slots.release()
+
+
+class OdbcClient:
+    max_prepared_cursors = 16
 
-class OdbcClient(metaclass=Singleton):
     def __init__(
         self,
         server: str,
@@ -32,8 +211,12 @@ class OdbcClient(metaclass=Singleton):
         username: str,
         password: str,
         logger: logging.Logger,
+        arraysize: int = 2000,
+        max_pool_size: int = 4,
+        min_pool_size: int = 1,
     ) -> None:
         self.logger = logger
+        self.arraysize = arraysize
 
         conn_str = ";".join(
             [
@@ -47,53 +230,122 @@ class OdbcClient(metaclass=Singleton):
             ]
         )
 
-        self._connection = pyodbc.connect(conn_str)
+        self._conn_str = conn_str
+        self._pool = OdbcConnectionPool.for_dsn(
+            conn_str, logger, min_size=min_pool_size, max_size=max_pool_size
+        )
 
-        self.logger.info("ODBC connected")
+    def get_conn(self):
+        return self._pool.get_conn()
 
     def run_query(self, query: str, *params):
-        cursor = self._connection.cursor()
-        self.logger.info(f"Running query: {query}")
-        cursor.execute(query, *params)
-
-        row = cursor.fetchone()
-
-        result = list()
-
-        while row is not None:
-            result.append(row)
-            row = cursor.fetchone()
+        with self.get_conn() as connection, closing(connection.cursor()) as cursor:
+            self.logger.debug("Running query: %s", query)
+            cursor.execute(query, *params)
+            # the whole result is returned anyway, let pyodbc build it in one call
+            result = cursor.fetchall()
 
-        cursor.close()
         # self.logger.info(f"Query result: {result}")
         return result
 
     def run_query_all(self, query: str, *params):
-        cursor = self._connection.cursor()
-        cursor.execute(query, *params)
-        rows = cursor.fetchall()
-        for row in rows:
-            yield row
-        cursor.close()
-
-    def run_query_yield(self, query: str, *params):
-        cursor = self._connection.cursor()
-        # self.logger.info(f"query before: {query}")
-        try:
+        # drain in arraysize batches, the caller iterates rows one at a time
+        with self.get_conn() as connection, closing(connection.cursor()) as cursor:
             cursor.execute(query, *params)
-            # self.logger.info(f"Running query yield: {query}")
+            cursor.arraysize = self.arraysize
+            while True:
+                rows = cursor.fetchmany(self.arraysize)
+                if not rows:
+                    break
+                yield from rows
 
-            row = cursor.fetchone()
+    def get_prepared_cursor(
+        self, connection: pyodbc.Connection, query: str
+    ) -> pyodbc.Cursor:
+        """Return a cursor of the connection dedicated to the given SQL text.
 
-            while row is not None:
-                # self.logger.info(f"returning row: {row}")
-                yield row
-                row = cursor.fetchone()
+        pyodbc only re-prepares a statement when the SQL text of a cursor
+        changes, so reusing the cursor across pages of a parameterized query
+        skips the server-side parse and plan.
+        """
+        prepared_cursors = self._pool.prepared_cursors[connection]
+        cursor = prepared_cursors.pop(query, None)
+        if cursor is None:
+            cursor = connection.cursor()
+            if len(prepared_cursors) >= self.max_prepared_cursors:
+                _, evicted = prepared_cursors.popitem(last=False)
+                evicted.close()
+        prepared_cursors[query] = cursor
+        return cursor
+
+    def run_query_yield(
+        self,
+        query: str,
+        *params,
+        arraysize: Optional[int] = None,
+        connection: Optional[pyodbc.Connection] = None,
+    ):
+        """Yield the result rows of a query, fetched arraysize rows at a time.
+
+        Pass a connection already checked out of the pool to run on it, which
+        keeps the statement prepared on that connection across calls.
+        """
+        if connection is None:
+            with self.get_conn() as connection:
+                yield from self.run_query_yield(
+                    query, *params, arraysize=arraysize, connection=connection
+                )
+            return
 
-            cursor.close()
+        arraysize = arraysize or self.arraysize
+        cursor = self.get_prepared_cursor(connection, query)
+        exhausted = False
+        try:
+            cursor.execute(query, *params)
+            cursor.arraysize = arraysize
+
+            while True:
+                rows = cursor.fetchmany(arraysize)
+                if not rows:
+                    break
+                yield from rows
+            exhausted = True
         except Exception as e:
-            self.logger.warn(f"Error in row: {row}")
-            self.logger.error(f"Error in run_query_yield: {e}")
+            self.logger.error("Error in run_query_yield: %s", e)
+            raise
+        finally:
+            if not exhausted:
+                # don't hand a cursor in an unknown state to the next page
+                prepared_cursors = self._pool.prepared_cursors.get(connection, {})
+                if prepared_cursors.get(query) is cursor:
+                    del prepared_cursors[query]
+                cursor.close()
+
+    def run_query_arrow(self, query: str, batch_size: int, *params):
+        """Yield the result as pages of row tuples, one per Arrow record batch.
+
+        The whole result streams over a single arrow-odbc connection. Rows are
+        decoded column-wise and only turned into Python tuples at the end,
+        which avoids pyodbc's per-row conversion overhead. arrow-odbc binds
+        every parameter as text, so None is passed on as NULL and everything
+        else as its string form.
+        """
+        if arrow_odbc is None:
+            raise ImportError(
+                "arrow-odbc is required for the arrow fetch backend, "
+                "install it with `pip install tap-unanet[arrow]`"
+            )
+        reader = arrow_odbc.read_arrow_batches_from_odbc(
+            query=query,
+            connection_string=self._conn_str,
+            batch_size=batch_size,
+            parameters=[
+                None if param is None else str(param) for param in params
+            ]
+            or None,
+        )
+        for batch in reader:
+            yield list(zip(*[column.to_pylist() for column in batch.columns]))
 
     def get_schema_names(self) -> List[str]:
         return [
@@ -109,58 +361,153 @@ class OdbcClient(metaclass=Singleton):
             )
         ]
 
-    def get_possible_primary_keys(
-        self, schema_name: str, table_name: str
-    ) -> Optional[str]:
-        cursor = self._connection.cursor()
+    def run_catalog_query(self, query: str, fallback_query: str) -> list:
+        """Return the rows of a sys.* catalog query, or of its fallback.
 
-        row = cursor.statistics(
-            table=table_name, schema=schema_name, unique=True
-        ).fetchone()
-        self.logger.info(
-            f"Running statistics: schema_name: {schema_name}, table_name: {table_name}, row: {row}"
-        )
-        get_attribute_pos = lambda description, attr: next(
-            (i for i, el in enumerate(description) if el[0] == attr), None
+        Servers other than Virtuality have no sys schema, so the standard
+        information_schema query runs instead on the same connection. The
+        expected failure is logged at debug level and doesn't cost the pool
+        its connection.
+        """
+        with self.get_conn() as connection:
+            try:
+                with closing(connection.cursor()) as cursor:
+                    cursor.execute(query)
+                    return cursor.fetchall()
+            except pyodbc.Error as e:
+                self.logger.debug("Catalog query failed, using fallback: %s", e)
+                connection.rollback()
+            with closing(connection.cursor()) as cursor:
+                cursor.execute(fallback_query)
+                return cursor.fetchall()
+
+    def get_all_table_names(self) -> Dict[str, List[str]]:
+        """Return the table names of every schema, read with a single query."""
+        table_names: Dict[str, List[str]] = dict()
+        for schema_name, table_name in self.run_catalog_query(
+            'SELECT "SchemaName", "Name" FROM sys.tables ORDER BY "SchemaName", "Name"',
+            "SELECT table_schema, table_name FROM information_schema.tables "
+            "ORDER BY table_schema, table_name",
+        ):
+            table_names.setdefault(schema_name, []).append(table_name)
+        return table_names
+
+    def get_all_column_defs(self) -> Dict[tuple, List[dict]]:
+        """Return the column definitions of every table keyed by (schema, table)."""
+        column_defs: Dict[tuple, List[dict]] = dict()
+        rows = self.run_catalog_query(
+            'SELECT "SchemaName", "TableName", "Name", "DataType", '
+            "CASE WHEN \"NullType\" = 'No Nulls' THEN 'NO' ELSE 'YES' END "
+            'FROM sys.columns ORDER BY "SchemaName", "TableName", "Position"',
+            "SELECT table_schema, table_name, column_name, data_type, is_nullable "
+            "FROM information_schema.columns "
+            "ORDER BY table_schema, table_name, ordinal_position",
         )
+        for (schema_name, table_name), columns in itertools.groupby(
+            rows, key=lambda row: (row[0], row[1])
+        ):
+            # rows of a table may not be contiguous under the server's collation
+            column_defs.setdefault((schema_name, table_name), []).extend(
+                {
+                    "name": column_name,
+                    "type": type_name,
+                    "nullable": is_nullable != "NO",
+                }
+                for (_, _, column_name, type_name, is_nullable) in columns
+            )
+        return column_defs
+
+    def get_all_primary_keys(self) -> Dict[tuple, List[str]]:
+        """Return the declared primary key columns keyed by (schema, table)."""
+        primary_keys: Dict[tuple, List[str]] = dict()
+        for schema_name, table_name, column_name in self.run_catalog_query(
+            'SELECT "SchemaName", "TableName", "Name" FROM sys.keycolumns '
+            "WHERE \"KeyType\" = 'Primary' "
+            'ORDER BY "SchemaName", "TableName", "Position"',
+            "SELECT kcu.table_schema, kcu.table_name, kcu.column_name "
+            "FROM information_schema.table_constraints tc "
+            "JOIN information_schema.key_column_usage kcu "
+            "ON kcu.constraint_schema = tc.constraint_schema "
+            "AND kcu.constraint_name = tc.constraint_name "
+            "WHERE tc.constraint_type = 'PRIMARY KEY' "
+            "ORDER BY kcu.table_schema, kcu.table_name, kcu.ordinal_position",
+        ):
+            primary_keys.setdefault((schema_name, table_name), []).append(column_name)
+        return primary_keys
 
-        possible_primary_keys: List[str] = list()
-
-        while row is not None:
-            description = row.cursor_description
+    def get_possible_primary_keys(
+        self, schema_name: str, table_name: str
+    ) -> Optional[str]:
+        with self.get_conn() as connection, closing(connection.cursor()) as cursor:
+            primary_keys = [
+                row.column_name
+                for row in cursor.primaryKeys(table=table_name, schema=schema_name)
+            ]
+            if primary_keys:
+                return primary_keys
+
+            # a table has few index columns, read them in one call
+            rows = cursor.statistics(
+                table=table_name, schema=schema_name, unique=True
+            ).fetchall()
+            self.logger.debug(
+                "Running statistics: schema_name: %s, table_name: %s, rows: %d",
+                schema_name,
+                table_name,
+                len(rows),
+            )
+            possible_primary_keys: List[str] = list()
 
-            index_name_pos = get_attribute_pos(description, "index_name")
-            column_name_pos = get_attribute_pos(description, "column_name")
+            if not rows:
+                return possible_primary_keys
 
-            if index_name_pos is not None and column_name_pos is not None:
-                if row[index_name_pos] == f"pk_{table_name}":
-                    possible_primary_keys = [row[column_name_pos]]
-                    break
-                else:
-                    possible_primary_keys.append(row[column_name_pos])
+            # The description is the same for every row, resolve positions once
+            description = rows[0].cursor_description
+            index_name_pos = next(
+                (i for i, el in enumerate(description) if el[0] == "index_name"), None
+            )
+            column_name_pos = next(
+                (i for i, el in enumerate(description) if el[0] == "column_name"), None
+            )
+            if index_name_pos is None or column_name_pos is None:
+                return possible_primary_keys
 
-            row = cursor.fetchone()
+            pk_index_name = f"pk_{table_name}"
+            for row in rows:
+                if row[index_name_pos] == pk_index_name:
+                    return [row[column_name_pos]]
+                possible_primary_keys.append(row[column_name_pos])
 
-        return possible_primary_keys
+            return possible_primary_keys
 
     def get_table_column_defs(self, schema_name: str, table_name: str) -> List[Any]:
-        cursor = self._connection.cursor()
-
-        row = cursor.execute(
-            f"SELECT * FROM {schema_name}.{table_name} LIMIT 1"
-        ).fetchone()
-        self.logger.info(
-            f"Running get_table_column_defs: {row}, schema_name: {schema_name}, table_name: {table_name}"
-        )
-        if row is None:
-            return []
-
-        desc = row.cursor_description
-
-        return [
-            {"name": column_name, "type": type_code, "nullable": nullable}
-            for (column_name, type_code, _, _, _, _, nullable) in desc
-        ]
+        with self.get_conn() as connection, closing(connection.cursor()) as cursor:
+            rows = cursor.columns(table=table_name, schema=schema_name).fetchall()
+            self.logger.debug(
+                "Running get_table_column_defs: %d columns, "
+                "schema_name: %s, table_name: %s",
+                len(rows),
+                schema_name,
+                table_name,
+            )
+            if rows:
+                return [
+                    {
+                        "name": row.column_name,
+                        "type": row.type_name,
+                        "nullable": row.nullable != pyodbc.SQL_NO_NULLS,
+                    }
+                    for row in rows
+                ]
+
+            # Driver has no column metadata, read the result set shape without data
+            cursor.execute(f"SELECT * FROM {schema_name}.{table_name} WHERE 1=0")
+            desc = cursor.description
+
+            return [
+                {"name": column_name, "type": type_code, "nullable": nullable}
+                for (column_name, type_code, _, _, _, _, nullable) in desc
+            ]
 
 
 class UnanetConnector:
@@ -174,7 +521,65 @@ class UnanetConnector:
             self.config.get("username"),
             self.config.get("password"),
             self.logger,
+            self.config.get("fetch_batch_size", 2000),
+            self.config.get("max_pool_size", 4),
+            self.config.get("min_pool_size", 1),
+        )
+        # permissions decide which tables are visible, so the user is part of the key
+        cache_key = hashlib.sha256(
+            "|".join(
+                str(self.config.get(key))
+                for key in ("server", "port", "database", "username")
+            ).encode()
+        ).hexdigest()
+        self.catalog_cache_path: Path = (
+            Path("~/.cache/tap_unanet").expanduser() / f"{cache_key}.json"
+        )
+
+    def read_catalog_cache(self) -> Optional[List[dict]]:
+        """Return the cached catalog entries, or None if missing or expired."""
+        if self.config.get("refresh_catalog"):
+            return None
+        ttl = self.config.get("catalog_cache_ttl", 3600)
+        try:
+            age = time.time() - self.catalog_cache_path.stat().st_mtime
+            if age > ttl:
+                return None
+            return (orjson or json).loads(self.catalog_cache_path.read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def write_catalog_cache(self, entries: List[dict]) -> None:
+        """Atomically persist the discovered catalog entries."""
+        cache_dir = self.catalog_cache_path.parent
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=cache_dir, suffix=".tmp", delete=False
+        ) as f:
+            f.write(_dump_json(entries))
+        os.replace(f.name, self.catalog_cache_path)
+
+    def bootstrap_indexes(self) -> None:
+        """Create the indexes in bootstrap.sql the keyset pagination relies on.
+
+        A statement that fails, e.g. for lack of DDL rights, is logged and
+        skipped, the streams still work without the indexes, only slower.
+        """
+        sql = (Path(__file__).parent / "bootstrap.sql").read_text()
+        sql = "\n".join(
+            line for line in sql.splitlines() if not line.lstrip().startswith("--")
         )
+        for statement in sql.split(";"):
+            statement = statement.strip()
+            if not statement:
+                continue
+            statement = statement.format(schema=self.config.get("schema_name"))
+            try:
+                with self._odbc_client.get_conn() as connection:
+                    connection.execute(statement)
+                    connection.commit()
+            except pyodbc.Error as e:
+                self.logger.warning("Skipping index bootstrap statement: %s", e)
 
     @staticmethod
     def get_fully_qualified_name(
@@ -217,7 +622,7 @@ class UnanetConnector:
                     ]
                 )
             )
-        logging.info(f"Fully qualified name: {result}")
+        logging.debug("Fully qualified name: %s", result)
         return result
 
     def to_jsonschema_type(self, sql_type) -> dict:
@@ -239,47 +644,67 @@ class UnanetConnector:
         Returns:
             The JSON Schema representation of the provided type.
         """
-        type_name = sql_type.__name__
-
-        sqltype_lookup: Dict[str, dict] = {
-            "timestamp": th.DateTimeType.type_dict,
-            "datetime": th.DateTimeType.type_dict,
-            "date": th.DateType.type_dict,
-            "int": th.IntegerType.type_dict,
-            "number": th.NumberType.type_dict,
-            "decimal": th.NumberType.type_dict,
-            "double": th.NumberType.type_dict,
-            "float": th.NumberType.type_dict,
-            "string": th.StringType.type_dict,
-            "text": th.StringType.type_dict,
-            "str": th.StringType.type_dict,
-            "char": th.StringType.type_dict,
-            "bool": th.BooleanType.type_dict,
-            "variant": th.StringType.type_dict,
-        }
-
-        for sqltype, jsonschema_type in sqltype_lookup.items():
-            if sqltype.lower() in type_name.lower():
-                return jsonschema_type
-
-        return sqltype_lookup["string"]
+        type_name = sql_type if isinstance(sql_type, str) else sql_type.__name__
+        return _resolve_jsonschema_type(type_name.lower())
+
+    def describe_table(
+        self,
+        schema_name: str,
+        table_name: str,
+        all_column_defs: Dict[tuple, List[dict]],
+        all_primary_keys: Dict[tuple, List[str]],
+    ) -> tuple:
+        """Return the possible primary keys and column definitions of a table.
+
+        Tables missing from the bulk metadata fall back to per-table calls.
+        """
+        possible_primary_keys = all_primary_keys.get((schema_name, table_name))
+        if not possible_primary_keys:
+            possible_primary_keys = self._odbc_client.get_possible_primary_keys(
+                schema_name=schema_name,
+                table_name=table_name,
+            )
+        column_defs = all_column_defs.get((schema_name, table_name))
+        if not column_defs:
+            column_defs = self._odbc_client.get_table_column_defs(
+                schema_name=schema_name, table_name=table_name
+            )
+        return possible_primary_keys, column_defs
 
     def discover_catalog_entries(self):
+        cached = self.read_catalog_cache()
+        if cached is not None:
+            self.logger.info("Using cached catalog: %s", self.catalog_cache_path)
+            return cached
+
         result: List[dict] = list()
-        self.logger.info(f"schema names: {self._odbc_client.get_schema_names()}")
-        for schema_name in self._odbc_client.get_schema_names():
+        debug_entries: List[dict] = list()
+        # read tables, columns and primary keys of every schema in three queries
+        all_table_names = self._odbc_client.get_all_table_names()
+        all_column_defs = self._odbc_client.get_all_column_defs()
+        all_primary_keys = self._odbc_client.get_all_primary_keys()
+        self.logger.debug("schema names: %s", list(all_table_names))
+        for schema_name, table_names in all_table_names.items():
             if schema_name.lower() in ["pg_catalog", "sys"]:
                 continue
 
-            table_names = self._odbc_client.get_table_names(schema_name=schema_name)
-            self.logger.info(f"tables {table_names}")
-            with open(".secrets/tables-list.json", "w") as f:
-                json.dump(table_names, f)
-            table_names = [
-                "person",
-            ]
-            for table_name in table_names:
-                self.logger.info(f"table {schema_name}.{table_name}")
+            self.logger.debug("tables %s", table_names)
+            # metadata calls are round-trip bound, describe tables concurrently
+            with ThreadPoolExecutor(
+                max_workers=self.config.get("max_workers", 4)
+            ) as executor:
+                table_descriptions = list(
+                    executor.map(
+                        lambda table_name: self.describe_table(
+                            schema_name, table_name, all_column_defs, all_primary_keys
+                        ),
+                        table_names,
+                    )
+                )
+            for table_name, (possible_primary_keys, column_defs) in zip(
+                table_names, table_descriptions
+            ):
+                self.logger.debug("table %s.%s", schema_name, table_name)
                 unique_stream_id = self.get_fully_qualified_name(
                     db_name=None,
                     schema_name=schema_name,
@@ -287,17 +712,11 @@ class UnanetConnector:
                     delimiter="-",
                 )
 
-                possible_primary_keys = self._odbc_client.get_possible_primary_keys(
-                    schema_name=schema_name,
-                    table_name=table_name,
-                )
                 key_properties = possible_primary_keys or None
 
                 table_schema = th.PropertiesList()
 
-                for column_def in self._odbc_client.get_table_column_defs(
-                    schema_name=schema_name, table_name=table_name
-                ):
+                for column_def in column_defs:
                     column_name = column_def["name"]
                     is_nullable = column_def["nullable"] or False
 
@@ -312,9 +731,9 @@ class UnanetConnector:
                     )
 
                 schema = table_schema.to_dict()
-                self.logger.info(f"schema: {schema}")
-                with open(f".secrets/{table_name}-schema-entries.json", "a") as f:
-                    json.dump(
+                self.logger.debug("schema: %s", schema)
+                if self.config.get("debug_dump_schema"):
+                    debug_entries.append(
                         {
                             "tap_stream_id": unique_stream_id,
                             "stream": unique_stream_id,
@@ -322,63 +741,80 @@ class UnanetConnector:
                             "table": table_name,
                             "key_properties": key_properties,
                             "schema": schema,
-                        },
-                        f,
+                        }
                     )
 
-                addl_replication_methods: List[str] = [""]
+        if self.config.get("debug_dump_schema"):
+            dump_dir = Path(".secrets")
+            dump_dir.mkdir(exist_ok=True)
+            (dump_dir / "tables-list.json").write_bytes(
+                _dump_json(all_table_names, indent=True)
+            )
+            (dump_dir / "schema-entries.json").write_bytes(
+                _dump_json(debug_entries, indent=True)
+            )
+
+        self.write_catalog_cache(result)
+        return result
 
-                replication_method = next(
-                    reversed(["FULL_TABLE"] + addl_replication_methods)
-                )
 
-                # catalog_entry = CatalogEntry(
-                #     tap_stream_id=unique_stream_id,
-                #     stream=unique_stream_id,
-                #     table=table_name,
-                #     key_properties=key_properties,
-                #     schema=singer.Schema.from_dict(schema),
-                #     is_view=False,
-                #     replication_method=replication_method,
-                #     metadata=MetadataMapping.get_standard_metadata(
-                #         schema_name=schema_name,
-                #         schema=schema,
-                #         replication_method=replication_method,
-                #         key_properties=key_properties,
-                #         valid_replication_keys=None,
-                #     ),
-                #     database=None,
-                #     row_count=None,
-                #     stream_alias=None,
-                #     replication_key=None,
-                #     parent_stream_type=None,
-                #     parent_stream_id=None,
-                # )
-                # self.logger.info(f"catalog_entry: {catalog_entry}")
-                # result.append(catalog_entry.to_dict()
-                # break
+# page the sorted result with the SQL standard clause Virtuality accepts
+PAGE_SUFFIX = " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+# put on the prefetch queue after the last page
+PAGES_FINISHED = object()
 
-        return result
+
+def _json_default(obj: Any) -> Any:
+    # keep NUMERIC columns exact, like singer's simplejson use_decimal
+    if isinstance(obj, Decimal):
+        return orjson.Fragment(str(obj))
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _write_message(message) -> None:
+    """Write a Singer message like singer.write_message, serialized by orjson."""
+    line = orjson.dumps(message.asdict(), default=_json_default)
+    sys.stdout.write(line.decode() + "\n")
+    sys.stdout.flush()
+
+
+def install_message_writer() -> None:
+    """Have singer.write_message serialize with orjson when it is installed.
+
+    orjson.Fragment (3.9+) is needed to write decimals verbatim, older
+    versions keep singer's writer.
+    """
+    if orjson is not None and hasattr(orjson, "Fragment"):
+        singer.write_message = _write_message
 
 
 class UnanetStream(Stream):
     """Stream class for Unanet streams."""
 
-    conn = None
-    finished = False
-    page_size = 1000
-    offset = 0
-    page = 0
-    total = None
+    table_name: str
     query = None
-    query_total = None
     where_filters = None
     order_by_key = None
-    paginate = True
+    # pages fetched ahead of the one being processed
+    prefetch_pages = 2
+    # cursor.arraysize for this stream, defaults to the fetch_batch_size setting
+    fetch_batch_size = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # per instance, so streams never share a connector or pagination state
+        self.conn = None
+        self.offset = 0
+        self.page = 0
+        self.paginate = True
     
     @property
     def schema_name(self):
         return self.config.get('schema_name')
+
+    @property
+    def page_size(self) -> int:
+        return self.config.get("page_size", 1000)
     
     def next_page_token(
         self, context
@@ -391,7 +827,8 @@ class UnanetStream(Stream):
 
     def get_connection(self):
         if not self.conn:
-            self.conn = UnanetConnector(self)
+            # reuse the tap's connector rather than building one per stream
+            self.conn = getattr(self._tap, "connector", None) or UnanetConnector(self)
         return self.conn
 
     def get_selected_schema(self) -> dict:
@@ -408,66 +845,329 @@ class UnanetStream(Stream):
             logger=self.logger,
         )
 
+    @functools.cached_property
+    def _selected_columns(self) -> tuple:
+        """Names of the selected columns, in schema order.
+
+        The schema and the selection mask don't change during a sync, so this
+        is computed once per stream instead of once per row. Stream schemas
+        are flat, so reading the top level breadcrumbs of the mask gives the
+        same columns as get_selected_schema without copying the schema.
+        """
+        mask = self.mask
+        return tuple(
+            name
+            for name in self.schema["properties"]
+            if mask.get(("properties", name), True)
+        )
+
+    def apply_catalog(self, catalog) -> None:
+        """Apply a catalog and drop the column list cached from the old mask."""
+        super().apply_catalog(catalog)
+        self.__dict__.pop("_selected_columns", None)
+        self.__dict__.pop("_row_factory", None)
+
+    @functools.cached_property
+    def _row_factory(self):
+        """Build a record dict from a pyodbc row, which iterates like a tuple."""
+        return compile_row_builder(self._selected_columns)
+
     def post_process(self, row: dict, context: dict | None = None) -> dict | None:
-        try:
-            selected_column_names = self.get_selected_schema()["properties"].keys()
-            # self.logger.info(f"selected_column_names: {selected_column_names}")
-            combined_dict = dict(zip(selected_column_names, row))
-            return combined_dict
-        except Exception as e:
-            self.logger.error(f"Error in post_process: {e}")
-            print(f"Error in post_process: {row}")
-            return None
+        return self._row_factory(row)
 
-    def request_records(self, context: dict | None) -> Iterable[dict]:
-        # get order_query
-        #Override oder_by key if present
+    @property
+    def query_columns(self) -> tuple:
+        """Names of the columns the stream's query returns, in select order."""
+        return self._selected_columns
+
+    def column_expression(self, column: str) -> str:
+        """Return the SQL expression the stream's query selects a column from."""
+        return column
+
+    def get_order_keys(self) -> List[str]:
+        """Return the ORDER BY columns of a stream paged by offset."""
         if self.order_by_key:
-            self.logger.info(f"ORDER BY KEY {self.order_by_key}")
-            order_keys = self.order_by_key
-            if isinstance(order_keys, str):
-                order_keys = [order_keys]
-        else:
-            order_keys = self.primary_keys or []
-            if self.replication_key: 
-                order_keys.append(self.replication_key)
-        #Add order query 
-        self.logger.info(f"ORDER KEYS {order_keys}")
+            self.logger.debug("ORDER BY KEY %s", self.order_by_key)
+            if isinstance(self.order_by_key, str):
+                return [self.order_by_key]
+            return list(self.order_by_key)
+        order_keys = list(self.primary_keys or [])
+        if self.replication_key:
+            order_keys.append(self.replication_key)
+        return order_keys
+
+    def get_seek_columns(self) -> tuple:
+        """Return the replication key and primary key expressions pages seek on.
+
+        A single primary key breaks the ties of the replication key, any other
+        stream pages by offset and gets (None, None). Both come from the
+        stream's keys, the same columns keyset_pages reads back from the rows.
+        """
+        primary_keys = self.primary_keys or []
+        if not self.replication_key or len(primary_keys) != 1:
+            return None, None
+        return (
+            self.column_expression(self.replication_key),
+            self.column_expression(primary_keys[0]),
+        )
+
+    def get_order_query(self, order_keys: List[str], keyset_column) -> str:
+        """Return the ORDER BY clause, NULL keys first on the seek column."""
+        self.logger.debug("ORDER KEYS %s", order_keys)
         order_queries = []
         for order_key in order_keys:
-            order_queries.append(f"{order_key} ASC")
-        order_query = f" ORDER BY {', '.join(order_queries)}"
-        # request records
-        while self.paginate:
-            selected_column_names = list(self.get_selected_schema()["properties"].keys())
-            selected_column_names = ", ".join(selected_column_names)
-            if self.query:
-                query = self.query
-            else:    
-                query = f"SELECT {selected_column_names} FROM {self.schema_name}.{self.table_name}"
-            if self.replication_key:
-                start_date = self.get_starting_timestamp(context)
-                if start_date:
-                    start_date = start_date.strftime("%Y-%m-%d %H:%M:%S.%f")
-                    query = query + f" WHERE {self.replication_key} > TIMESTAMP '{start_date}'"
-                    # for now support additional filters for incremental streams only
-                    if self.where_filters:
-                        query = query + f" AND ({self.where_filters})"
-            if order_query:
-                query = query + order_query
-            offset = self.next_page_token(context)
+            if order_key == keyset_column:
+                # the seek filters skip NULL keys, so every NULL has to come
+                # before the first seek whatever the server's default is
+                order_queries.append(f"{order_key} ASC NULLS FIRST")
+            else:
+                order_queries.append(f"{order_key} ASC")
+        return f" ORDER BY {', '.join(order_queries)}"
+
+    def get_filters(self, context: dict | None, replication_column) -> tuple:
+        """Return the WHERE predicates and parameters shared by every page."""
+        filters = []
+        params = []
+        if self.replication_key:
+            start_date = self.get_starting_timestamp(context)
+            if start_date:
+                # sorted streams emit state mid-sync, a resumed run has to
+                # re-read the bookmark value, targets dedupe on the key
+                operator = ">=" if self.is_sorted else ">"
+                # qualified like the order keys, so joined queries stay unambiguous
+                filters.append(f"{replication_column} {operator} ?")
+                params.append(start_date.replace(tzinfo=None))
+        # filter in SQL on full syncs too, rows the stream drops never cross the wire
+        if self.where_filters:
+            filters.append(f"({self.where_filters})")
+        return filters, params
+
+    def build_query(self, filters: List[str], suffix: str) -> str:
+        """Return the stream's SELECT with the filters and the given suffix."""
+        if self.query:
+            query = self.query
+        else:
+            selected_column_names = ", ".join(self._selected_columns)
             query = (
-                query + f" OFFSET {offset} ROWS FETCH NEXT {self.page_size} ROWS ONLY"
+                f"SELECT {selected_column_names} "
+                f"FROM {self.schema_name}.{self.table_name}"
+            )
+        if filters:
+            query = query + " WHERE " + " AND ".join(filters)
+        return query + suffix
+
+    def fetch_page(self, odbc_connection, query: str, params: list) -> list:
+        """Run one page query on the checked out connection and return its rows."""
+        self.logger.debug(
+            "Running get_records for stream %s with query: %s, params: %s",
+            self.name,
+            query,
+            params,
+        )
+        page_started = time.perf_counter()
+        rows = self.get_connection()._odbc_client.run_query_yield(
+            query,
+            *params,
+            arraysize=self.fetch_batch_size,
+            connection=odbc_connection,
+        )
+        records = list(rows)
+        self.logger.info(
+            "Fetched page for stream %s: rows=%d elapsed=%.3fs",
+            self.name,
+            len(records),
+            time.perf_counter() - page_started,
+        )
+        return records
+
+    def offset_pages(
+        self,
+        context: dict | None,
+        query: str,
+        params: list,
+        stopped: threading.Event,
+    ) -> Iterator[list]:
+        """Yield the pages of a stream without a seek key, by OFFSET."""
+        self.offset = 0
+        self.page = 0
+        self.paginate = True
+        # hold one pooled connection for the whole sync: pyodbc prepares a
+        # statement per cursor, so every page reuses the plan of the first
+        with self.get_connection()._odbc_client.get_conn() as odbc_connection:
+            while self.paginate and not stopped.is_set():
+                offset = self.next_page_token(context)
+                records = self.fetch_page(
+                    odbc_connection, query, params + [offset, self.page_size]
+                )
+                # a short page is the last one, no need to ask for an empty page
+                if len(records) < self.page_size:
+                    self.paginate = False
+                yield records
+
+    def keyset_pages(
+        self,
+        filters: List[str],
+        params: list,
+        order_query: str,
+        keyset_column: str,
+        tiebreak_column: str,
+        stopped: threading.Event,
+    ) -> Iterator[list]:
+        """Yield the pages of a stream seeking past the last (key, tiebreak) pair.
+
+        NULL keys sort first and are paged on the tiebreak column alone, then
+        the seek continues on the (replication key, primary key) pair.
+        """
+        suffix = order_query + PAGE_SUFFIX
+        first_page_query = self.build_query(filters, suffix)
+        null_keyset_query = self.build_query(
+            filters
+            + [
+                f"(({keyset_column} IS NULL AND {tiebreak_column} > ?)"
+                f" OR {keyset_column} IS NOT NULL)"
+            ],
+            suffix,
+        )
+        keyset_query = self.build_query(
+            filters
+            + [
+                f"({keyset_column} > ? "
+                f"OR ({keyset_column} = ? AND {tiebreak_column} > ?))"
+            ],
+            suffix,
+        )
+        # keyset values are read from the fetched rows by position, so a row
+        # post_process rejects can't derail the seek
+        columns = self.query_columns
+        key_pos = columns.index(self.replication_key)
+        tiebreak_pos = columns.index((self.primary_keys or [])[0])
+        last_key = None
+        last_tiebreak = None
+        seek_params: list
+        with self.get_connection()._odbc_client.get_conn() as odbc_connection:
+            while not stopped.is_set():
+                if last_key is not None:
+                    query = keyset_query
+                    seek_params = [last_key, last_key, last_tiebreak]
+                elif last_tiebreak is not None:
+                    query = null_keyset_query
+                    seek_params = [last_tiebreak]
+                else:
+                    query = first_page_query
+                    seek_params = []
+                records = self.fetch_page(
+                    odbc_connection, query, params + seek_params + [0, self.page_size]
+                )
+                if records:
+                    # read before yielding, the consumer maps the page in place
+                    last_key = records[-1][key_pos]
+                    last_tiebreak = records[-1][tiebreak_pos]
+                yield records
+                # a short page is the last one, no need to ask for an empty page
+                if len(records) < self.page_size:
+                    return
+
+    def request_pages(
+        self, context: dict | None, stopped: Optional[threading.Event] = None
+    ) -> Generator[list, None, None]:
+        """Yield the stream's rows a page at a time.
+
+        The SQL text of every page is built once, pages only bind new
+        parameters so the statement stays prepared on the connection. Once
+        the stopped event is set no further page is requested.
+        """
+        stopped = stopped or threading.Event()
+        keyset_column, tiebreak_column = self.get_seek_columns()
+        if keyset_column:
+            order_keys = [keyset_column, tiebreak_column]
+        else:
+            order_keys = self.get_order_keys()
+        replication_column = None
+        if self.replication_key:
+            replication_column = self.column_expression(self.replication_key)
+        filters, params = self.get_filters(context, replication_column)
+        order_query = self.get_order_query(order_keys, keyset_column)
+        if self.config.get("use_arrow_odbc"):
+            # one unpaginated query, the record batches are the pages
+            yield from self.get_connection()._odbc_client.run_query_arrow(
+                self.build_query(filters, order_query), self.page_size, *params
+            )
+        elif keyset_column:
+            yield from self.keyset_pages(
+                filters, params, order_query, keyset_column, tiebreak_column, stopped
             )
-            self.logger.info(f"Running get_records for stream {self.name} with query: {query}")
-            connection = self.get_connection()
-            records = list(connection._odbc_client.run_query_yield(query))
-            if not len(records):
-                self.paginate = False
-                self.logger.info(f"Set paginate: {self.paginate} stream {self.name}")
-            yield from records
+        else:
+            query = self.build_query(filters, order_query + PAGE_SUFFIX)
+            yield from self.offset_pages(context, query, params, stopped)
+
+    def _put_page(self, pages: queue.Queue, stopped: threading.Event, item) -> bool:
+        """Queue an item for the consumer, giving up once it has stopped."""
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce_pages(
+        self, context: dict | None, pages: queue.Queue, stopped: threading.Event
+    ) -> None:
+        """Fetch pages into the queue until the last one, an error or a stop."""
+        try:
+            with closing(self.request_pages(context, stopped)) as request_pages:
+                for page in request_pages:
+                    if not self._put_page(pages, stopped, page):
+                        return
+            self._put_page(pages, stopped, PAGES_FINISHED)
+        except Exception as e:
+            self._put_page(pages, stopped, e)
+
+    def prefetched_pages(self, context: dict | None) -> Iterable[list]:
+        """Yield pages while the next one is fetched in a background thread.
+
+        pyodbc releases the GIL while it waits on the server, so fetching page
+        N+1 on a pooled connection overlaps with processing page N here.
+        """
+        pages: queue.Queue = queue.Queue(maxsize=self.prefetch_pages)
+        stopped = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_pages,
+            args=(context, pages, stopped),
+            name=f"{self.name}-prefetch",
+            daemon=True,
+        )
+        producer.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is PAGES_FINISHED:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            stopped.set()
+
+    def request_records(self, context: dict | None) -> Iterable[dict]:
+        for page in self.prefetched_pages(context):
+            yield from page
 
     def get_records(self, context: dict | None) -> Iterable[dict]:
+        if type(self).post_process is UnanetStream.post_process:
+            # plain column mapping, build the whole page without a call per row
+            row_factory = self._row_factory
+            for page in self.prefetched_pages(context):
+                # map in place, so a page is never held as both rows and dicts
+                try:
+                    for index, row in enumerate(page):
+                        page[index] = row_factory(row)
+                except Exception:
+                    self.logger.error("Failed to map a page of stream %s", self.name)
+                    raise
+                yield from page
+            return
+
         for record in self.request_records(context):
             transformed_record = self.post_process(record, context)
             if transformed_record is None:
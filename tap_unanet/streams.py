@@ -1,11 +1,11 @@
 """Stream type classes for tap-unanet."""
 
-from pathlib import Path
-from typing import Any, Dict, Optional, Union, List, Iterable
+import functools
+from types import MappingProxyType
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
-from tap_unanet.client import UnanetStream
+from tap_unanet.client import UnanetStream, compile_row_builder
 
 
 class GeneralLedgerStream(UnanetStream):
@@ -15,14 +15,16 @@ class GeneralLedgerStream(UnanetStream):
     primary_keys = ["general_ledger_key"]
     # replication_key = "transaction_date"
     replication_key = "post_date"
+    # pages are read in (post_date, key) order, so state can advance mid-sync
+    is_sorted = True
     
     schema = th.PropertiesList(
-        th.Property("general_ledger_key", th.NumberType),
+        th.Property("general_ledger_key", th.IntegerType),
         th.Property("feature", th.NumberType),
         th.Property("post_date", th.DateTimeType),
-        th.Property("fiscal_month_key", th.NumberType),
-        th.Property("account_key", th.NumberType),
-        th.Property("organization_key", th.NumberType),
+        th.Property("fiscal_month_key", th.IntegerType),
+        th.Property("account_key", th.IntegerType),
+        th.Property("organization_key", th.IntegerType),
         th.Property("document_number", th.StringType),
         th.Property("reference", th.StringType),
         th.Property("description", th.StringType),
@@ -30,9 +32,9 @@ class GeneralLedgerStream(UnanetStream):
         th.Property("quantity", th.NumberType),
         th.Property("debit_amount", th.NumberType),
         th.Property("credit_amount", th.NumberType),
-        th.Property("project_key", th.NumberType),
-        th.Property("person_key", th.NumberType),
-        th.Property("customer_key", th.NumberType),
+        th.Property("project_key", th.IntegerType),
+        th.Property("person_key", th.IntegerType),
+        th.Property("customer_key", th.IntegerType),
         th.Property("local_debit_amount", th.NumberType),
         th.Property("local_credit_amount", th.NumberType),
         th.Property("instance_debit_amount", th.NumberType),
@@ -65,6 +67,11 @@ class AccountsStream(UnanetStream):
         th.Property("parent_name", th.StringType),
     ).to_dict()
 
+    # columns of the query, in select order
+    properties_list = (
+        "account_key","account_code","description","type","active","entry_allowed","begin_date","end_date","project_required","hide_income_stmt_hdr","category_1099","node_key","parent_key","account_parent_key","parent_code","parent_name"
+    )
+
     @property
     def query(self):
         query = f"SELECT a.account_key,a.account_code,a.description,a.type,a.active,a.entry_allowed,a.begin_date,a.end_date,a.project_required,a.hide_income_stmt_hdr,a.category_1099,h.node_key,h.parent_key as parent_key,pa.account_key as account_parent_key,pa.account_code as parent_code,pa.description as parent_name FROM {self.schema_name}.{self.table_name} a LEFT JOIN {self.schema_name}.acct_fin_tree h ON a.account_key = h.node_key LEFT JOIN {self.schema_name}.account pa ON h.parent_key = pa.account_key"
@@ -73,10 +80,7 @@ class AccountsStream(UnanetStream):
     def post_process(self, row, context):
         try:
             # Ignore selected catalog map all properties
-            properties_list = [
-                "account_key","account_code","description","type","active","entry_allowed","begin_date","end_date","project_required","hide_income_stmt_hdr","category_1099","node_key","parent_key","account_parent_key","parent_code","parent_name"
-            ]
-            combined_dict = dict(zip(properties_list, row))
+            combined_dict = dict(zip(self.properties_list, row))
             return combined_dict
         except Exception as e:
             self.logger.error(f"Error in post_process: {e} in row {row}")
@@ -108,7 +112,6 @@ class CustomersStream(UnanetStream):
         th.Property("entry_allowed", th.StringType),
         th.Property("begin_date", th.DateTimeType),
         th.Property("end_date", th.DateTimeType),
-        th.Property("entry_allowed", th.StringType),
         th.Property("recipient_name_1099", th.StringType),
         th.Property("vendor_1099", th.StringType),
         th.Property("federal_tax_id", th.StringType),
@@ -124,18 +127,20 @@ class CustomersStream(UnanetStream):
         th.Property("customer_type", th.StringType),
     ).to_dict()
 
+    # columns of the query, in select order
+    properties_list = (
+        "customer_key","customer_code","customer_name","customer_type_key","customer_size","account_number","sic_code","classification","industry","sector","stock_symbol","url","active","financial_org","legal_entity","legal_entity_key","default_gl_post_org_key","entry_allowed","begin_date","end_date","recipient_name_1099","vendor_1099","federal_tax_id","federal_tax_id_type","email_1099","last_project_code_seq","start_with_project_code_seq","transact_elimination_flag","last_updated_timestamp","created_timestamp","currency_code_key","default_person_org_flag","customer_type"
+    )
+
     @property
     def query(self):
-        query = f"SELECT c.customer_key,c.customer_code,c.customer_name,c.customer_type_key,c.customer_size,c.account_number,c.sic_code,c.classification,c.industry,c.sector,c.stock_symbol,c.url,c.active,c.financial_org,c.legal_entity,c.legal_entity_key,c.default_gl_post_org_key,c.entry_allowed,c.begin_date,c.end_date,c.entry_allowed,c.recipient_name_1099,c.vendor_1099,c.federal_tax_id,c.federal_tax_id_type,c.email_1099,c.last_project_code_seq,c.start_with_project_code_seq,c.transact_elimination_flag,c.last_updated_timestamp,c.created_timestamp,c.currency_code_key,c.default_person_org_flag,ct.customer_type FROM {self.schema_name}.{self.table_name} c LEFT JOIN {self.schema_name}.customer_type ct ON c.customer_type_key = ct.customer_type_key"
+        query = f"SELECT c.customer_key,c.customer_code,c.customer_name,c.customer_type_key,c.customer_size,c.account_number,c.sic_code,c.classification,c.industry,c.sector,c.stock_symbol,c.url,c.active,c.financial_org,c.legal_entity,c.legal_entity_key,c.default_gl_post_org_key,c.entry_allowed,c.begin_date,c.end_date,c.recipient_name_1099,c.vendor_1099,c.federal_tax_id,c.federal_tax_id_type,c.email_1099,c.last_project_code_seq,c.start_with_project_code_seq,c.transact_elimination_flag,c.last_updated_timestamp,c.created_timestamp,c.currency_code_key,c.default_person_org_flag,ct.customer_type FROM {self.schema_name}.{self.table_name} c LEFT JOIN {self.schema_name}.customer_type ct ON c.customer_type_key = ct.customer_type_key"
         return query
     
     def post_process(self, row, context):
         try:
             # Ignore selected catalog map all properties
-            properties_list = [
-                "customer_key","customer_code","customer_name","customer_type_key","customer_size","account_number","sic_code","classification","industry","sector","stock_symbol","url","active","financial_org","legal_entity","legal_entity_key","default_gl_post_org_key","entry_allowed","begin_date","end_date","entry_allowed","recipient_name_1099","vendor_1099","federal_tax_id","federal_tax_id_type","email_1099","last_project_code_seq","start_with_project_code_seq","transact_elimination_flag","last_updated_timestamp","created_timestamp","currency_code_key","default_person_org_flag","customer_type"
-            ]
-            combined_dict = dict(zip(properties_list, row))
+            combined_dict = dict(zip(self.properties_list, row))
             return combined_dict
         except Exception as e:
             self.logger.error(f"Error in post_process: {e} in row {row}")
@@ -143,7 +148,7 @@ class CustomersStream(UnanetStream):
 
 
 class PersonsStream(UnanetStream):
-    name = "persons "
+    name = "persons"
     primary_keys = ["person_key"]
     table_name = "person"
     replication_key = "last_modified_timestamp"
@@ -204,7 +209,8 @@ class PnLDetailStream(UnanetStream):
     table_name = "general_ledger"
     primary_keys = ["gl_key"]
     replication_key = "post_date"
-    order_by_key = ["gl.general_ledger_key", "gl.post_date"]
+    # pages are read in (post_date, key) order, so state can advance mid-sync
+    is_sorted = True
     where_filters = "a.type IN ('R', 'E')"
     schema = th.PropertiesList(
         th.Property("gl_key", th.IntegerType),
@@ -248,33 +254,164 @@ class PnLDetailStream(UnanetStream):
         th.Property("net_amount", th.NumberType),
     ).to_dict()
     
+    # output column -> (select expression, join aliases it reads from)
+    column_sources = MappingProxyType({
+        "gl_key": ("gl.general_ledger_key", ()),
+        "feature": ("gl.feature", ()),
+        "post_date": ("gl.post_date", ()),
+        "fiscal_month_key": ("gl.fiscal_month_key", ()),
+        "organization_key": ("gl.organization_key", ()),
+        "document_number": ("gl.document_number", ()),
+        "reference": ("gl.reference", ()),
+        "description": ("gl.description", ()),
+        "transaction_date": ("gl.transaction_date", ()),
+        "quantity": ("gl.quantity", ()),
+        "debit_amount": ("gl.debit_amount", ()),
+        "credit_amount": ("gl.credit_amount", ()),
+        "project_key": ("gl.project_key", ()),
+        "person_key": ("gl.person_key", ()),
+        "customer_key": ("gl.customer_key", ()),
+        "local_debit_amount": ("gl.local_debit_amount", ()),
+        "local_credit_amount": ("gl.local_credit_amount", ()),
+        "instance_debit_amount": ("gl.instance_debit_amount", ()),
+        "instance_credit_amount": ("gl.instance_credit_amount", ()),
+        "transaction_currency": ("gl.transaction_currency", ()),
+        "local_currency": ("gl.local_currency", ()),
+        "account_code": ("a.account_code", ("a",)),
+        "account_key": ("a.account_key", ("a",)),
+        "account_type": ("a.type", ("a",)),
+        "account_name": ("a.description", ("a",)),
+        "organization_code": ("c.customer_code", ("c",)),
+        "customer_code": ("c_.customer_code", ("c_",)),
+        "organization_name": ("c.customer_name", ("c",)),
+        "customer_name": ("c_.customer_name", ("c_",)),
+        "organization_type_key": ("c.customer_type_key", ("c",)),
+        "customer_type_key": ("c_.customer_type_key", ("c_",)),
+        "organization_type": ("org_ct.customer_type", ("c", "org_ct")),
+        "customer_type": ("ct.customer_type", ("c_", "ct")),
+        "person_code": ("p.person_code", ("p",)),
+        "person_first_name": ("p.first_name", ("p",)),
+        "person_last_name": ("p.last_name", ("p",)),
+        "project_name": ("pr.title", ("pr",)),
+    })
+    # customer can represent many entities, here both customer_key and
+    # organization_key make reference to the same table
+    # that's why there are 2 joins on the same table ticket: HGI-6156
+    joins = MappingProxyType({
+        "a": "LEFT JOIN {schema}.account a ON gl.account_key = a.account_key",
+        "c": "LEFT JOIN {schema}.customer c ON gl.organization_key = c.customer_key",
+        "c_": "LEFT JOIN {schema}.customer c_ ON gl.customer_key = c_.customer_key",
+        "org_ct": (
+            "LEFT JOIN {schema}.customer_type org_ct "
+            "ON c.customer_type_key = org_ct.customer_type_key"
+        ),
+        "ct": (
+            "LEFT JOIN {schema}.customer_type ct "
+            "ON c_.customer_type_key = ct.customer_type_key"
+        ),
+        "p": "LEFT JOIN {schema}.person p ON gl.person_key = p.person_key",
+        "pr": "LEFT JOIN {schema}.project pr ON gl.project_key = pr.project_key",
+    })
+    # read even when not selected: keyset position and net_amount inputs
+    required_columns = (
+        "gl_key",
+        "post_date",
+        "account_type",
+        "debit_amount",
+        "credit_amount",
+    )
+    # sign of (credit_amount - debit_amount) in net_amount per account type
+    net_amount_signs = MappingProxyType({"R": 1, "E": -1})
+
+    @functools.cached_property
+    def properties_list(self):
+        """Columns of the query, the selected ones plus the required ones."""
+        columns = set(self._selected_columns) | set(self.required_columns)
+        return tuple(column for column in self.column_sources if column in columns)
+
+    @property
+    def query_columns(self):
+        return self.properties_list
+
+    def column_expression(self, column):
+        return self.column_sources[column][0]
+
+    @functools.cached_property
+    def build_row(self):
+        return compile_row_builder(self.properties_list)
+
+    @functools.cached_property
+    def net_amount_positions(self):
+        """Row positions of account_type, credit_amount and debit_amount."""
+        return tuple(
+            self.properties_list.index(column)
+            for column in ("account_type", "credit_amount", "debit_amount")
+        )
+
+    def apply_catalog(self, catalog) -> None:
+        super().apply_catalog(catalog)
+        self.__dict__.pop("properties_list", None)
+        self.__dict__.pop("build_row", None)
+        self.__dict__.pop("net_amount_positions", None)
+
     @property
     def query(self):
-        return f"SELECT gl.general_ledger_key as gl_key, gl.feature,gl.post_date,gl.fiscal_month_key,gl.account_key,gl.organization_key,gl.document_number,gl.reference,gl.description,gl.transaction_date,gl.quantity,gl.debit_amount,gl.credit_amount,gl.project_key,gl.person_key,gl.customer_key,gl.local_debit_amount,gl.local_credit_amount,gl.instance_debit_amount,gl.instance_credit_amount,gl.transaction_currency,gl.local_currency,a.account_code,a.account_key,a.type as account_type,a.description as account_name,c.customer_code as organization_code, c_.customer_code as customer_code,c.customer_name as organization_name, c_.customer_name as customer_name,c.customer_type_key as organization_type_key,c_.customer_type_key as customer_type_key,org_ct.customer_type as organization_type,ct.customer_type as customer_type,p.person_code,p.first_name as person_first_name,p.last_name as person_last_name,pr.title as project_name FROM {self.schema_name}.general_ledger gl LEFT JOIN {self.schema_name}.account a ON gl.account_key = a.account_key LEFT JOIN {self.schema_name}.customer c ON gl.organization_key = c.customer_key LEFT JOIN {self.schema_name}.customer c_ ON gl.customer_key = c_.customer_key LEFT JOIN {self.schema_name}.customer_type org_ct ON c.customer_type_key = org_ct.customer_type_key LEFT JOIN {self.schema_name}.customer_type ct ON c_.customer_type_key = ct.customer_type_key LEFT JOIN {self.schema_name}.person p ON gl.person_key = p.person_key LEFT JOIN {self.schema_name}.project pr ON gl.project_key = pr.project_key "
-    # customer can represent many entities, here both customer_key and organization_key make reference to the same table
-    # that's why there are 2 joins on the same table ticket: HGI-6156
+        select = ",".join(
+            f"{self.column_sources[column][0]} as {column}"
+            for column in self.properties_list
+        )
+        aliases = {
+            alias
+            for column in self.properties_list
+            for alias in self.column_sources[column][1]
+        }
+        # the account join is always needed by where_filters
+        aliases.add("a")
+        joins = " ".join(
+            join.format(schema=self.schema_name)
+            for alias, join in self.joins.items()
+            if alias in aliases
+        )
+        return f"SELECT {select} FROM {self.schema_name}.general_ledger gl {joins} "
     
     def post_process(self, row, context):
         try:
-            # Ignore selected catalog map all properties
-            # properties_list = self.schema['properties'].keys()
-            properties_list = [
-                "gl_key","feature","post_date","fiscal_month_key","account_key","organization_key","document_number","reference","description","transaction_date","quantity","debit_amount","credit_amount","project_key","person_key","customer_key","local_debit_amount","local_credit_amount","instance_debit_amount","instance_credit_amount","transaction_currency","local_currency","account_code","account_key","account_type","account_name","organization_code","customer_code","organization_name","customer_name","organization_type_key","customer_type_key","organization_type","customer_type","person_code","person_first_name","person_last_name","project_name"
-            ]
-            combined_dict = dict(zip(properties_list, row))
-            self.logger.info(f"Processing row {combined_dict}")
-            # Calculate net amount
-            self.logger.info("Calculating totals for net amount...")
-            if combined_dict.get("account_type") == "R":
-                combined_dict["net_amount"] = combined_dict.get("credit_amount") - combined_dict.get("debit_amount")
-            elif combined_dict.get("account_type") == "E":
-                combined_dict["net_amount"] = combined_dict.get("debit_amount") - combined_dict.get("credit_amount")
-            self.logger.info(f"Processed pnl row {combined_dict}")
+            combined_dict = self.build_row(row)
+            # Calculate net amount from the row tuple, no dict lookups
+            type_pos, credit_pos, debit_pos = self.net_amount_positions
+            # where_filters only lets revenue and expense accounts through
+            sign = self.net_amount_signs[row[type_pos]]
+            combined_dict["net_amount"] = sign * (row[credit_pos] - row[debit_pos])
+            self.logger.debug("Processed pnl row %s", combined_dict)
             return combined_dict
         except Exception as e:
             self.logger.error(f"Error in post_process: {e} in row {row}")
             return None
 
+    def get_records(self, context):
+        """Map and total whole pages in one loop instead of a call per row."""
+        if type(self).post_process is not PnLDetailStream.post_process:
+            # a subclass maps rows its own way, call it for every row
+            yield from super().get_records(context)
+            return
+        build_row = self.build_row
+        type_pos, credit_pos, debit_pos = self.net_amount_positions
+        signs = self.net_amount_signs
+        for page in self.prefetched_pages(context):
+            index = 0
+            try:
+                for index, row in enumerate(page):
+                    record = build_row(row)
+                    record["net_amount"] = signs[row[type_pos]] * (
+                        row[credit_pos] - row[debit_pos]
+                    )
+                    page[index] = record
+            except Exception:
+                # keep the mapped rows, let post_process log and drop the bad ones
+                tail = (self.post_process(row, context) for row in page[index:])
+                page[index:] = [record for record in tail if record is not None]
+            yield from page
+
 
 class ProjectsStream(UnanetStream):
     """Define custom stream."""
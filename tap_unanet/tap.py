@@ -1,9 +1,11 @@
 """Unanet tap class."""
 
+from functools import cached_property
 from typing import List
 
 from singer_sdk import Tap, Stream
 from singer_sdk import typing as th  
+from tap_unanet.client import UnanetConnector, install_message_writer
 from tap_unanet.streams import (
     GeneralLedgerStream,
     AccountsStream,
@@ -57,13 +59,111 @@ class TapUnanet(Tap):
             required=True,
             description="Password of the user of database"
         ),
+        th.Property(
+            "use_arrow_odbc",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Fetch records column-wise through arrow-odbc "
+                "(requires the `arrow` extra)"
+            )
+        ),
+        th.Property(
+            "max_workers",
+            th.IntegerType,
+            default=4,
+            description=(
+                "Number of threads (and ODBC connections) "
+                "used for concurrent queries"
+            )
+        ),
+        th.Property(
+            "max_pool_size",
+            th.IntegerType,
+            default=4,
+            description="Maximum number of open ODBC connections"
+        ),
+        th.Property(
+            "min_pool_size",
+            th.IntegerType,
+            default=1,
+            description="Number of ODBC connections opened up front"
+        ),
+        th.Property(
+            "page_size",
+            th.IntegerType,
+            default=1000,
+            description="Number of rows requested per query page"
+        ),
+        th.Property(
+            "fetch_batch_size",
+            th.IntegerType,
+            default=2000,
+            description="Rows pulled from the ODBC driver per fetch (cursor.arraysize)"
+        ),
+        th.Property(
+            "catalog_cache_ttl",
+            th.IntegerType,
+            default=3600,
+            description="Seconds a discovered catalog is reused before re-introspecting"
+        ),
+        th.Property(
+            "refresh_catalog",
+            th.BooleanType,
+            default=False,
+            description="Ignore the cached catalog and re-introspect the database"
+        ),
+        th.Property(
+            "bootstrap_index",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Create the indexes in bootstrap.sql before syncing "
+                "(needs DDL rights)"
+            )
+        ),
+        th.Property(
+            "debug_dump_schema",
+            th.BooleanType,
+            default=False,
+            description=(
+                "Write the discovered table schemas "
+                "to .secrets/schema-entries.json"
+            )
+        ),
     ).to_dict()
 
+    def __init__(self, *args, **kwargs) -> None:
+        # records are written with orjson from here on, not on import
+        install_message_writer()
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def connector(self) -> UnanetConnector:
+        """The connector, and with it the ODBC pool, shared by every stream."""
+        connector = UnanetConnector(self)
+        # streams only ask for the connector once they sync
+        if self.config.get("bootstrap_index"):
+            connector.bootstrap_indexes()
+        return connector
+
     def discover_streams(self) -> List[Stream]:
         # conn = UnanetConnector(self)
         # return conn.discover_catalog_entries()
         """Return a list of discovered streams."""
-        return [stream_class(tap=self) for stream_class in STREAM_TYPES]
+        for stream_class in STREAM_TYPES:
+            # stream names are state and selection keys, stray spaces break both
+            assert stream_class.name == stream_class.name.strip(), stream_class.name
+        stream_types = STREAM_TYPES
+        if self.input_catalog:
+            # syncing from a catalog, streams it leaves out are never built
+            stream_types = [
+                stream_class
+                for stream_class in STREAM_TYPES
+                if stream_class.name in self.input_catalog
+            ]
+        return [stream_class(tap=self) for stream_class in stream_types]
+
 
 if __name__ == "__main__":
     TapUnanet.cli()
\ No newline at end of file
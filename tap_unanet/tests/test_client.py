@@ -0,0 +1,344 @@
+"""Tests for the helpers in tap_unanet.client."""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pyodbc
+import pytest
+import singer
+
+from tap_unanet.client import (
+    SQLTYPE_LOOKUP,
+    OdbcClient,
+    OdbcConnectionPool,
+    _dump_json,
+    _resolve_jsonschema_type,
+    _write_message,
+    UnanetStream,
+    compile_row_builder,
+    install_message_writer,
+)
+
+
+@pytest.mark.parametrize(
+    "type_name,expected",
+    [
+        ("datetime", "datetime"),
+        ("smalldatetime", "datetime"),
+        ("date", "date"),
+        ("bigint", "int"),
+        ("decimal", "decimal"),
+        ("character varying", "char"),
+        ("boolean", "bool"),
+        ("bytearray", "bytearray"),
+        ("uuid", "string"),
+        ("xml", "string"),
+    ],
+)
+def test_resolve_jsonschema_type(type_name, expected):
+    """Resolve a type name to the first lookup key it contains."""
+    assert _resolve_jsonschema_type(type_name) is SQLTYPE_LOOKUP[expected]
+
+
+@pytest.mark.parametrize(
+    "type_name,json_type",
+    [
+        ("numeric", "number"),
+        ("real", "number"),
+        ("money", "number"),
+        ("bigdecimal", "number"),
+        ("long", "integer"),
+        ("short", "integer"),
+        ("byte", "integer"),
+        ("biginteger", "integer"),
+        ("longvarchar", "string"),
+        ("bytearray", "string"),
+        ("varbinary", "string"),
+    ],
+)
+def test_resolve_jsonschema_type_of_driver_type_names(type_name, json_type):
+    """ODBC and Virtuality type names map like the Python types they hold."""
+    assert _resolve_jsonschema_type(type_name) == {"type": [json_type]}
+
+
+def test_get_all_column_defs_keeps_non_contiguous_tables():
+    """Columns of a table split across the catalog rows are all kept."""
+    client = OdbcClient.__new__(OdbcClient)
+    client.run_catalog_query = lambda query, fallback_query: [
+        ("dbo", "person", "person_key", "long", "NO"),
+        ("dbo", "project", "project_key", "long", "NO"),
+        ("dbo", "person", "first_name", "string", "YES"),
+    ]
+    assert client.get_all_column_defs()[("dbo", "person")] == [
+        {"name": "person_key", "type": "long", "nullable": False},
+        {"name": "first_name", "type": "string", "nullable": True},
+    ]
+
+
+@pytest.mark.parametrize("indent", [False, True])
+def test_dump_json_round_trip(indent):
+    """Dumped bytes load back to the same object with the stdlib parser."""
+    entries = [{"tap_stream_id": "dbo-projects", "key_properties": ["project_key"]}]
+    assert json.loads(_dump_json(entries, indent=indent)) == entries
+
+
+def test_compile_row_builder_matches_zip():
+    """The compiled builder maps like dict(zip()), including duplicate names."""
+    columns = ("gl_key", "account_key", "amount", "account_key")
+    row = (1, 10, 2.5, 20)
+    assert compile_row_builder(columns)(row) == dict(zip(columns, row))
+
+
+def test_write_message_keeps_decimals_exact(capsys):
+    """Records are written as one JSON line with NUMERIC values verbatim."""
+    orjson = pytest.importorskip("orjson")
+    if not hasattr(orjson, "Fragment"):
+        pytest.skip("orjson.Fragment requires orjson 3.9")
+
+    class Message:
+        def asdict(self):
+            return {
+                "type": "RECORD",
+                "stream": "pnl_detail",
+                "record": {"net_amount": Decimal("10.50")},
+            }
+
+    _write_message(Message())
+    assert capsys.readouterr().out == (
+        '{"type":"RECORD","stream":"pnl_detail","record":{"net_amount":10.50}}\n'
+    )
+
+
+def test_message_writer_is_only_installed_explicitly(monkeypatch):
+    """Importing the client leaves singer's writer alone until installed."""
+    orjson = pytest.importorskip("orjson")
+    if not hasattr(orjson, "Fragment"):
+        pytest.skip("orjson.Fragment requires orjson 3.9")
+
+    monkeypatch.setattr(singer, "write_message", singer.write_message)
+    assert singer.write_message is not _write_message
+    install_message_writer()
+    assert singer.write_message is _write_message
+
+
+class SqliteClient:
+    """Stand-in for OdbcClient that runs the page queries on sqlite."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.checked_out = 0
+        self.pages = 0
+
+    @contextmanager
+    def get_conn(self):
+        self.checked_out += 1
+        try:
+            yield self.connection
+        finally:
+            self.checked_out -= 1
+
+    def run_query_yield(self, query, *params, arraysize=None, connection=None):
+        self.pages += 1
+        # sqlite spells OFFSET ... FETCH NEXT as LIMIT ... OFFSET
+        query = query.replace(
+            " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY", " LIMIT ? OFFSET ?"
+        )
+        *params, offset, limit = params
+        return iter(connection.execute(query, [*params, limit, offset]).fetchall())
+
+
+class SqliteConnector:
+    def __init__(self, connection):
+        self._odbc_client = SqliteClient(connection)
+
+
+class PersonPagesStream(UnanetStream):
+    name = "persons"
+    table_name = "person"
+    replication_key = "last_modified_timestamp"
+
+    def get_starting_timestamp(self, context):
+        return None
+
+
+class SortedPersonPagesStream(PersonPagesStream):
+    is_sorted = True
+
+    def get_starting_timestamp(self, context):
+        return datetime(2024, 1, 4)
+
+
+def make_stream(primary_keys, page_size=10, stream_class=PersonPagesStream):
+    # the prefetch thread pages on the connection made here
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.execute(
+        "CREATE TABLE person "
+        "(person_key INTEGER, org_key INTEGER, last_modified_timestamp TEXT)"
+    )
+    rows = [
+        # heavy ties across page boundaries, and every 7th key NULL
+        (key, key % 3, None if key % 7 == 0 else f"2024-01-0{1 + key % 4} 00:00:00")
+        for key in range(253)
+    ]
+    random.Random(0).shuffle(rows)
+    connection.executemany("INSERT INTO person VALUES (?, ?, ?)", rows)
+
+    stream = stream_class.__new__(stream_class)
+    stream.primary_keys = primary_keys
+    stream._config = {"schema_name": "main", "page_size": page_size}
+    stream.logger = logging.getLogger("test")
+    stream.conn = SqliteConnector(connection)
+    stream.__dict__["_selected_columns"] = (
+        "person_key",
+        "org_key",
+        "last_modified_timestamp",
+    )
+    return stream
+
+
+@pytest.mark.parametrize(
+    "primary_keys",
+    [
+        # seek on (replication key, primary key)
+        ["person_key"],
+        # no single key to break ties with, paged by OFFSET
+        ["org_key", "person_key"],
+    ],
+)
+def test_request_pages_returns_every_row_once(primary_keys):
+    """Ties on the replication key and NULL keys neither drop nor repeat rows."""
+    stream = make_stream(primary_keys)
+    keys = [row[0] for page in stream.request_pages(None) for row in page]
+    assert sorted(keys) == list(range(253))
+
+
+def test_request_pages_sorted_stream_rereads_the_bookmark():
+    """A resumed sorted stream re-reads the rows that share the bookmark value."""
+    stream = make_stream(["person_key"], stream_class=SortedPersonPagesStream)
+    keys = [row[0] for page in stream.request_pages(None) for row in page]
+    assert sorted(keys) == [key for key in range(253) if key % 7 and key % 4 == 3]
+
+
+class FailingPagesStream(UnanetStream):
+    name = "failing"
+
+    def request_pages(self, context, stopped=None):
+        yield [(1,)]
+        raise ValueError("page 2 failed")
+
+
+def test_prefetched_pages_reraises_producer_errors():
+    """An error fetching a page is raised where the pages are consumed."""
+    stream = FailingPagesStream.__new__(FailingPagesStream)
+    pages = stream.prefetched_pages(None)
+    assert next(pages) == [(1,)]
+    with pytest.raises(ValueError, match="page 2 failed"):
+        next(pages)
+
+
+def test_prefetched_pages_stops_the_producer_when_closed_early():
+    """Closing the pages early ends the thread and returns its connection."""
+    stream = make_stream(["person_key"], page_size=5)
+    client = stream.conn._odbc_client
+    pages = stream.prefetched_pages(None)
+    next(pages)
+    producer = next(
+        thread
+        for thread in threading.enumerate()
+        if thread.name == f"{stream.name}-prefetch"
+    )
+    pages.close()
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    assert client.checked_out == 0
+    # 51 pages in all, only the prefetched ones were requested
+    assert client.pages <= stream.prefetch_pages + 2
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.closed = False
+
+    def execute(self, query, *params):
+        return self
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """Stand-in for pyodbc.Connection serving a fixed result."""
+
+    def __init__(self, rows=((1,), (2,), (3,))):
+        self.rows = rows
+        self.closed = False
+        self.broken = False
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+    def execute(self, query, *params):
+        if self.broken:
+            raise pyodbc.Error("08S01", "Communication link failure")
+        return self.cursor().execute(query, *params)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(pyodbc, "connect", lambda conn_str: FakeConnection())
+    return OdbcConnectionPool("DSN=fake", logging.getLogger("test"), 1, 1)
+
+
+def test_pool_discards_a_connection_that_raised(pool):
+    """A connection that raised a pyodbc error is closed, not checked in."""
+    with pytest.raises(pyodbc.Error):
+        with pool.get_conn() as connection:
+            raise pyodbc.Error("08S01", "Communication link failure")
+    assert connection.closed
+    assert connection not in pool.prepared_cursors
+    with pool.get_conn() as replacement:
+        assert replacement is not connection
+
+
+def test_pool_replaces_a_connection_failing_the_keepalive(pool):
+    """An idle connection that fails the ping is swapped for a new one."""
+    with pool.get_conn() as connection:
+        pass
+    connection.broken = True
+    pool.keepalive = -1
+    with pool.get_conn() as replacement:
+        assert replacement is not connection
+    assert connection.closed
+
+
+def test_pool_releases_the_slot_of_a_generator_closed_early(pool):
+    """Closing a half consumed run_query_yield hands the slot back."""
+    client = OdbcClient.__new__(OdbcClient)
+    client.logger = logging.getLogger("test")
+    client.arraysize = 1
+    client._pool = pool
+
+    rows = client.run_query_yield("SELECT key FROM t")
+    assert next(rows) == (1,)
+    assert not pool._slots.acquire(blocking=False)
+    rows.close()
+    assert pool._slots.acquire(blocking=False)
+    pool._slots.release()
+    assert pool._idle.qsize() == 1
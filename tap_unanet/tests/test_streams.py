@@ -0,0 +1,82 @@
+"""Tests for the query building of tap_unanet.streams."""
+
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+from tap_unanet.streams import PnLDetailStream
+
+
+def make_pnl_stream(selected_columns, stream_class=PnLDetailStream):
+    stream = stream_class.__new__(stream_class)
+    stream._config = {"schema_name": "dbo"}
+    stream.logger = logging.getLogger("test")
+    stream.__dict__["_selected_columns"] = tuple(selected_columns)
+    return stream
+
+
+def test_pnl_query_joins_only_what_the_selected_columns_read():
+    """Deselected columns drop their joins, the account join always stays."""
+    stream = make_pnl_stream(["gl_key", "post_date", "customer_type"])
+    query = stream.query
+    assert query.startswith(
+        "SELECT gl.general_ledger_key as gl_key,gl.post_date as post_date,"
+    )
+    assert "c_.customer_type_key = ct.customer_type_key" in query
+    assert " dbo.customer c_ " in query
+    assert " dbo.account a " in query
+    for alias in (" c ", " org_ct ", " p ", " pr "):
+        assert alias not in query
+
+
+def test_pnl_query_reads_the_required_columns():
+    """Seek and net_amount inputs are selected even when deselected."""
+    stream = make_pnl_stream(["description"])
+    assert stream.properties_list == (
+        "gl_key",
+        "post_date",
+        "description",
+        "debit_amount",
+        "credit_amount",
+        "account_type",
+    )
+    assert " dbo.customer " not in stream.query
+
+
+# gl_key, post_date, debit_amount, credit_amount, account_type
+PNL_ROWS = [
+    (1, datetime(2024, 1, 1), Decimal("5.00"), Decimal("15.50"), "R"),
+    (2, datetime(2024, 1, 1), Decimal("5.00"), Decimal("15.50"), "E"),
+    # where_filters keeps other account types out, a stray one is dropped
+    (3, datetime(2024, 1, 2), Decimal("1.00"), Decimal("2.00"), "X"),
+    (4, datetime(2024, 1, 2), Decimal("1.00"), Decimal("2.00"), "R"),
+]
+
+
+def test_pnl_get_records_totals_net_amount():
+    """Pages are mapped with net_amount signed by account type."""
+    stream = make_pnl_stream(["gl_key", "net_amount"])
+    stream.prefetched_pages = lambda context: iter([list(PNL_ROWS)])
+    records = list(stream.get_records(None))
+    assert [(r["gl_key"], r["net_amount"]) for r in records] == [
+        (1, Decimal("10.50")),
+        (2, Decimal("-10.50")),
+        (4, Decimal("1.00")),
+    ]
+
+
+class TaggedPnLDetailStream(PnLDetailStream):
+    def post_process(self, row, context):
+        record = super().post_process(row, context)
+        if record is not None:
+            record["tagged"] = True
+        return record
+
+
+def test_pnl_get_records_calls_an_overridden_post_process():
+    """A subclass overriding post_process has it called for every row."""
+    stream = make_pnl_stream(["gl_key", "net_amount"], TaggedPnLDetailStream)
+    stream.prefetched_pages = lambda context: iter([list(PNL_ROWS)])
+    records = list(stream.get_records(None))
+    assert [r["gl_key"] for r in records] == [1, 2, 4]
+    assert all(r["tagged"] for r in records)